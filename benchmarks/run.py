@@ -0,0 +1,360 @@
+"""
+    Benchmarks for the package import and the events, logger and ipscan
+    hot paths.
+
+    python benchmarks/run.py [-o results.json] [-c baseline.json] [-k filter] [-l label]
+
+    Every case reports the best time per operation over several repeats.
+    Results are written as JSON so runs from different versions can be
+    compared with --compare. Runs are labelled with git describe of the
+    checkout unless --label is given. Cases needing an API the installed
+    version lacks are skipped.
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import typing as T
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yusholib  # noqa: E402
+from yusholib.events import Observable, ObservableProperty  # noqa: E402
+from yusholib.ipscan import IpRange, IpRangeScanner  # noqa: E402
+from yusholib.logger import Logger  # noqa: E402
+
+try:
+    from yusholib.logger import StreamSink
+except ImportError:  # before Logger sinks
+    StreamSink = None  # type: ignore
+
+# A case returns the statement to time and how many operations one call
+# of it performs, optionally followed by a cleanup function.
+Case = T.Callable[[], T.Tuple[T.Any, ...]]
+
+CASES = {}  # type: T.Dict[str, Case]
+
+
+class Skip(Exception):
+    """Raised by a case the installed version can't run."""
+
+
+def case(name: str) -> T.Callable[[Case], Case]:
+    """Registers a benchmark case under the given name."""
+
+    def _wrapper(func: Case) -> Case:
+        CASES[name] = func
+        return func
+
+    return _wrapper
+
+
+def _noop(*args: T.Any, **kw: T.Any) -> None:
+    pass
+
+
+def _trigger(handlers: int) -> Case:
+    def _case() -> T.Tuple[T.Callable[[], T.Any], int]:
+        obs = Observable()
+        for _ in range(handlers):
+            obs.on("event", lambda *args: None)
+        return lambda: obs.trigger("event", 1), 1
+
+    return _case
+
+
+for _count in (0, 1, 10, 1000):
+    case("events.trigger[{} handlers]".format(_count))(_trigger(_count))
+
+
+@case("events.once[subscribe+trigger]")
+def _once_churn() -> T.Tuple[T.Callable[[], T.Any], int]:
+    obs = Observable()
+    obs.on("event", _noop)
+
+    def _run() -> None:
+        obs.once("event", _noop)
+        obs.trigger("event")
+
+    return _run, 1
+
+
+class _Holder(Observable):
+    def __init__(self) -> None:
+        super().__init__()
+        self.value = 0
+
+    @ObservableProperty
+    def prop(self) -> int:
+        return self.value
+
+    @prop.setter
+    def prop(self, value: int) -> None:
+        self.value = value
+
+
+def _property(listeners: bool, action: str) -> Case:
+    def _case() -> T.Tuple[T.Callable[[], T.Any], int]:
+        holder = _Holder()
+        if listeners:
+            for event in ("before_get_prop", "after_get_prop",
+                          "before_set_prop", "after_set_prop"):
+                holder.on(event, _noop)
+        if action == "get":
+            return lambda: holder.prop, 1
+
+        def _set() -> None:
+            holder.prop = 1
+
+        return _set, 1
+
+    return _case
+
+
+for _listeners in (False, True):
+    for _action in ("get", "set"):
+        case("property.{}[{}]".format(
+            _action, "listeners" if _listeners else "no listeners"
+        ))(_property(_listeners, _action))
+
+
+_FIELDS = "abcdefghij"
+
+
+def _field(name: str) -> ObservableProperty:
+    def _get(self: T.Any) -> int:
+        return self.values[name]
+
+    def _set(self: T.Any, value: int) -> None:
+        self.values[name] = value
+
+    _get.__name__ = _set.__name__ = name
+    return ObservableProperty(_get, _set)
+
+
+class _Record(Observable):
+    def __init__(self) -> None:
+        super().__init__()
+        self.values = dict.fromkeys(_FIELDS, 0)
+
+    a, b, c, d, e, f, g, h, i, j = (_field(name) for name in _FIELDS)
+
+
+def _update(batched: bool) -> Case:
+    def _case() -> T.Tuple[T.Callable[[], T.Any], int]:
+        record = _Record()
+        fields = dict.fromkeys(_FIELDS, 1)
+        for name in _FIELDS:
+            record.on("before_set_" + name, _noop)
+            record.on("after_set_" + name, _noop)
+        record.on("after_update", _noop)
+        if batched:
+            if not hasattr(record, "update"):
+                raise Skip("no batched updates")
+            return lambda: record.update(**fields), 1
+
+        def _set() -> None:
+            for name, value in fields.items():
+                setattr(record, name, value)
+
+        return _set, 1
+
+    return _case
+
+
+case("property.set[10 fields, listeners]")(_update(False))
+case("property.update[10 fields, listeners]")(_update(True))
+
+
+def _log(level: str, hide_time: bool) -> Case:
+    def _case() -> T.Tuple[T.Any, ...]:
+        devnull = open(os.devnull, "w")
+        if StreamSink is not None:
+            log = Logger("info", hide_time=hide_time, sinks=[StreamSink(devnull)])
+            cleanup = devnull.close
+        else:
+            # older versions always print() to stdout
+            log = Logger("info", hide_time=hide_time)
+            stdout, sys.stdout = sys.stdout, devnull
+
+            def cleanup() -> None:
+                sys.stdout = stdout
+                devnull.close()
+
+        method = getattr(log, level)
+        if hasattr(log, "is_enabled"):
+            return lambda: method("request {} took {}ms", 42, 1.5), 1, cleanup
+        # without lazy formatting callers format up front
+        return lambda: method("request {} took {}ms".format(42, 1.5)), 1, cleanup
+
+    return _case
+
+
+case("logger.info[enabled]")(_log("info", False))
+case("logger.info[enabled, hidden time]")(_log("info", True))
+case("logger.debug[disabled]")(_log("debug", False))
+
+
+def _scan(hosts: int) -> Case:
+    def _case() -> T.Tuple[T.Any, ...]:
+        try:
+            ip_range = IpRange("127.0.0.1", "127.0.0.{}".format(hosts))
+        except Exception as exc:  # pylint: disable=broad-except
+            raise Skip("IpRange is broken: {!r}".format(exc))
+
+        # Only 127.0.0.1 listens, every other loopback address refuses
+        # the connection right away.
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(128)
+        listener.setblocking(False)
+        port = listener.getsockname()[1]
+        directory = tempfile.mkdtemp()
+        result_file = os.path.join(directory, "result.txt")
+        scanner = IpRangeScanner(ip_range, port, result_file)
+
+        def _run() -> None:
+            scanner.scan()
+            while True:
+                try:
+                    listener.accept()[0].close()
+                except BlockingIOError:
+                    break
+            # keep the result file from growing with every loop
+            os.remove(result_file)
+
+        def _cleanup() -> None:
+            listener.close()
+            shutil.rmtree(directory, ignore_errors=True)
+
+        return _run, hosts, _cleanup
+
+    return _case
+
+
+case("ipscan.scan[loopback, 1 open / 31 closed]")(_scan(32))
+
+
+def _import(module: str) -> Case:
+    def _case() -> T.Tuple[T.Callable[[], T.Any], int]:
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        command = [sys.executable, "-c", "import " + module]
+        # includes the interpreter's startup, which is what a short-lived
+        # process importing the package pays
+        return lambda: subprocess.run(command, env=env, check=True), 1
+
+    return _case
+
+
+case("import yusholib[fresh interpreter]")(_import("yusholib"))
+case("import yusholib.events[fresh interpreter]")(_import("yusholib.events"))
+
+
+def run_case(func: Case, repeat: int, min_time: float) -> T.Dict[str, T.Any]:
+    """Times a case and returns its best time per operation."""
+
+    stmt, ops, *cleanup = func()
+    try:
+        timer = timeit.Timer(stmt)
+        number = 1
+        while True:
+            elapsed = timer.timeit(number)
+            if elapsed >= min_time or number >= 10 ** 7:
+                break
+            number *= 10
+        timings = [elapsed] + timer.repeat(repeat - 1, number)
+    finally:
+        for func in cleanup:
+            func()
+    best = min(timings) / (number * ops)
+    return {"ns_per_op": best * 1e9, "ops_per_sec": 1 / best if best else None,
+            "loops": number, "repeat": repeat}
+
+
+def compare(results: T.Dict[str, T.Any], baseline: T.Dict[str, T.Any]) -> None:
+    """Prints the ratio of every case to the same case in baseline."""
+
+    for name, result in results["cases"].items():
+        old = baseline["cases"].get(name)
+        if old is None or "ns_per_op" not in old or "ns_per_op" not in result:
+            continue
+        ratio = result["ns_per_op"] / old["ns_per_op"]
+        print("{:<45} {:>12.1f} ns  x{:.2f} vs {}".format(
+            name, result["ns_per_op"], ratio, baseline.get("label", baseline["yusholib"])
+        ))
+
+
+def git_describe() -> T.Optional[str]:
+    """Returns git describe of the checkout yusholib is imported from, or
+    None outside a git checkout."""
+
+    try:
+        result = subprocess.run(
+            ["git", "describe", "--tags", "--always", "--dirty"],
+            cwd=os.path.dirname(os.path.abspath(yusholib.__file__)),
+            capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def main(argv: T.List[str] = None) -> T.Dict[str, T.Any]:  # type: ignore
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", help="write results as JSON to this file")
+    parser.add_argument("-c", "--compare", help="JSON results of an earlier run")
+    parser.add_argument("-k", "--filter", default="", help="only run cases containing this text")
+    parser.add_argument("-l", "--label",
+                        help="name of this run in comparisons, git describe by default")
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="minimum seconds per timing loop")
+    args = parser.parse_args(argv)
+
+    # version_info and __version__ aren't bumped for every change, the
+    # commit tells runs of the same version apart
+    commit = git_describe()
+    version = yusholib.__version__
+    results = {
+        "label": args.label or commit or version,
+        "yusholib": version,
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "created": time.time(),
+        "cases": {},
+    }  # type: T.Dict[str, T.Any]
+
+    for name, func in CASES.items():
+        if args.filter not in name:
+            continue
+        try:
+            result = run_case(func, args.repeat, args.min_time)
+        except Skip as exc:
+            results["cases"][name] = {"skipped": str(exc)}
+            print("{:<45} skipped: {}".format(name, exc))
+            continue
+        results["cases"][name] = result
+        print("{:<45} {:>12.1f} ns/op".format(name, result["ns_per_op"]))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+    return results
+
+
+if __name__ == "__main__":
+    main()
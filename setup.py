@@ -60,6 +60,7 @@ setup(
     license='MIT',
     url="https://github.com/yushodev/yusholib",
     install_requires=[],
+    extras_require={'colour': ['pystyle']},
     setup_requires=['pytest-runner'],
     tests_require=['pytest==7.2.2'],
     test_suite='tests',
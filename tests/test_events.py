@@ -1,8 +1,15 @@
+import copy
+import pickle
 import threading
+import tracemalloc
+from collections import defaultdict
 
 import pytest
 
-from yusholib.events import Observable, EventNotFound, HandlerNotFound, ObservableProperty
+from yusholib.events import (
+    CompactObservable, Observable, EventNotFound, HandlerNotFound, ObservableProperty,
+    batch_update
+)
 
 
 def test_on_decorator():
@@ -51,7 +58,7 @@ def test_once():
 
     assert len(obs._events["once_test"]) == 1
     assert obs.trigger("once_test")
-    assert obs._events["once_test"] == []
+    assert obs.get_handlers("once_test") == []
 
 
 def test_on_trigger():
@@ -65,7 +72,7 @@ def test_on_trigger():
     def on_test(obj):
         obj.called = True
 
-    assert obs._events == {"on_test": [on_test]}
+    assert obs.get_all_handlers() == {"on_test": [on_test]}
     assert obs.trigger("on_test", obj)
     assert obj.called
 
@@ -82,10 +89,10 @@ def test_once_trigger():
         obj.called = True
 
     assert len(obs._events["once_test"]) == 1
-    assert obs._events["once_test"] == [once_test]
+    assert obs.get_handlers("once_test") == [once_test]
     assert obs.trigger("once_test", obj)
     assert obj.called
-    assert obs._events["once_test"] == []
+    assert obs.get_handlers("once_test") == []
     assert not obs.trigger("once_test", obj)
 
 
@@ -107,12 +114,12 @@ def test_off():
     def on_test():
         pass
 
-    assert obs._events["on_test"] == [on_test]
+    assert obs.get_handlers("on_test") == [on_test]
     assert obs.trigger("on_test")
 
     obs.off("on_test", on_test)
 
-    assert obs._events["on_test"] == []
+    assert obs.get_handlers("on_test") == []
 
     obs.off()
 
@@ -130,11 +137,11 @@ def test_off():
     def func3():
         pass
 
-    assert obs._events["more_than_one_event"] == [func1, func2, func3]
+    assert obs.get_handlers("more_than_one_event") == [func1, func2, func3]
     obs.off("more_than_one_event", func2)
-    assert obs._events["more_than_one_event"] == [func1, func3]
+    assert obs.get_handlers("more_than_one_event") == [func1, func3]
     obs.off("more_than_one_event")
-    assert obs._events["more_than_one_event"] == []
+    assert obs.get_handlers("more_than_one_event") == []
 
 
 def test_off_exceptions():
@@ -507,4 +514,466 @@ def test_custom_observable_attr():
 
     called = False
     obj.prop
-    assert called is True
\ No newline at end of file
+    assert called is True
+
+def test_has_handlers():
+    """test has_handlers() before and after registering a handler"""
+    obs = Observable()
+
+    def some_test():
+        pass
+
+    assert not obs.has_handlers("some_event")
+    obs.on("some_event", some_test)
+    assert obs.has_handlers("some_event")
+    obs.off("some_event", some_test)
+    assert not obs.has_handlers("some_event")
+
+
+class _EagerObservable:
+    """Observable as it was before handler maps were allocated lazily."""
+
+    def __init__(self):
+        self._events = defaultdict(list)
+
+
+def _memory_per_instance(cls, count=10000):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        instances = [cls() for _ in range(count)]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del instances
+    # don't count the list holding the instances
+    return (after - before) / count - 8
+
+
+def test_idle_memory():
+    """test the per-instance memory of idle observables"""
+    eager = _memory_per_instance(_EagerObservable)
+    lazy = _memory_per_instance(Observable)
+    compact = _memory_per_instance(CompactObservable)
+    assert compact <= 48
+    assert compact < lazy < eager
+    assert compact * 3 < eager
+
+
+def test_compact_has_no_dict():
+    """test CompactObservable doesn't allocate a __dict__ or handler map"""
+    obs = CompactObservable()
+
+    assert not hasattr(obs, "__dict__")
+    assert obs._events is CompactObservable()._events
+    with pytest.raises(TypeError):
+        obs._events["event"] = []
+
+
+def test_idle_calls_are_allocation_free():
+    """test trigger and get_all_handlers on idle observables don't
+    allocate memory"""
+    observables = [CompactObservable(), Observable()]
+
+    for obs in observables:
+        obs.trigger("event")
+        obs.get_all_handlers()
+        obs.has_handlers("event")
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(1000):
+            for obs in observables:
+                obs.trigger("event", 1)
+                obs.get_all_handlers()
+                obs.has_handlers("event")
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    # get_traced_memory() itself accounts for a few bytes
+    assert after - before < 64
+    assert all(obs._events is observables[0]._events for obs in observables)
+
+
+def test_compact_observable():
+    """test CompactObservable works as Observable and releases its map"""
+    obs = CompactObservable()
+    results = []
+
+    obs.on("event", results.append)
+    assert obs.trigger("event", 1)
+    assert results == [1]
+    assert obs.get_all_handlers() == {"event": [results.append]}
+
+    obs.off()
+    assert obs._events is CompactObservable()._events
+    assert not obs.trigger("event", 2)
+
+
+def test_compact_observable_property():
+    """test ObservableProperty triggers events on a CompactObservable"""
+
+    class Obj(CompactObservable):
+        __slots__ = ("value",)
+
+        @ObservableProperty
+        def prop(self):
+            return self.value
+
+        @prop.setter
+        def prop(self, value):
+            self.value = value
+
+    obj = Obj()
+    results = []
+
+    obj.on("after_set_prop", results.append)
+    obj.prop = 3
+
+    assert results == [3]
+
+
+def _field(name):
+    def _get(self):
+        return self._values[name]
+
+    def _set(self, value):
+        self._values[name] = value
+
+    _get.__name__ = _set.__name__ = name
+    return ObservableProperty(_get, _set)
+
+
+class _Point(Observable):
+    def __init__(self):
+        super().__init__()
+        self._values = dict.fromkeys("abcdefghij", 0)
+
+    a, b, c, d, e, f, g, h, i, j = (_field(name) for name in "abcdefghij")
+
+
+def _count_calls(obj):
+    calls = []
+    for name in "abcdefghij":
+        obj.on("before_set_" + name, lambda *args: calls.append(args))
+        obj.on("after_set_" + name, lambda *args: calls.append(args))
+    obj.on("after_update", lambda *args: calls.append(args))
+    return calls
+
+
+def test_batch_coalesces_events():
+    """test a batch triggers one after_update event instead of one pair
+    of events per field"""
+    fields = {name: n for n, name in enumerate("abcdefghij", 1)}
+
+    obj = _Point()
+    calls = _count_calls(obj)
+    for name, value in fields.items():
+        setattr(obj, name, value)
+    assert len(calls) == 20
+
+    obj = _Point()
+    calls = _count_calls(obj)
+    obj.update(**fields)
+    assert calls == [({name: (0, value) for name, value in fields.items()},)]
+    assert obj.j == 10
+
+
+def test_nested_batches():
+    """test nested batches keep the first old value and trigger once"""
+    obj = _Point()
+    calls = _count_calls(obj)
+
+    with obj.batch() as changes:
+        obj.a = 1
+        with obj.batch():
+            obj.a = 2
+            obj.b = 3
+        assert not calls
+        assert changes == {"a": (0, 2), "b": (0, 3)}
+
+    assert calls == [({"a": (0, 2), "b": (0, 3)},)]
+    obj.a = 4
+    assert len(calls) == 3
+
+
+def test_batch_is_thread_local():
+    """test a batch doesn't defer assignments made by other threads and
+    threads can batch the same Observable at the same time"""
+    obj = _Point()
+    calls = _count_calls(obj)
+    entered = threading.Barrier(2)
+
+    def other():
+        obj.b = 5
+        with obj.batch():
+            entered.wait()
+            obj.c = 6
+            entered.wait()
+
+    with obj.batch():
+        thread = threading.Thread(target=other)
+        thread.start()
+        entered.wait()
+        obj.a = 1
+        entered.wait()
+        thread.join()
+        assert calls[:2] == [(5,), (5,)]
+        assert calls[2:] == [({"c": (0, 6)},)]
+
+    assert calls[3:] == [({"a": (0, 1)},)]
+
+
+def test_batch_with_custom_observable():
+    """test batching properties whose Observable is an attribute"""
+
+    class Obj:
+        def __init__(self):
+            self.events = CompactObservable()
+            self.value = 0
+
+        @ObservableProperty.create_with(event="value", observable="events")
+        def prop(self):
+            return self.value
+
+        @prop.setter
+        def prop(self, value):
+            self.value = value
+
+    obj = Obj()
+    calls = []
+    obj.events.on("after_set_value", calls.append)
+    obj.events.on("after_update", calls.append)
+
+    with obj.events.batch():
+        obj.prop = 1
+        obj.prop = 2
+
+    assert calls == [{"value": (0, 2)}]
+
+
+def test_update_rejects_unknown_fields():
+    """test update() only assigns ObservableProperties"""
+    obj = _Point()
+    calls = _count_calls(obj)
+
+    with pytest.raises(AttributeError):
+        obj.update(a=1, typo=2)
+
+    assert not hasattr(obj, "typo")
+    assert obj.a == 0
+    assert calls == []
+
+
+def test_batch_update_holder():
+    """test batch_update() on a holder whose properties trigger events on
+    an Observable attribute"""
+
+    class Obj:
+        def __init__(self):
+            self.events = CompactObservable()
+            self.value = 0
+
+        @ObservableProperty.create_with(observable="events")
+        def prop(self):
+            return self.value
+
+        @prop.setter
+        def prop(self, value):
+            self.value = value
+
+    obj = Obj()
+    calls = []
+    obj.events.on("after_set_prop", calls.append)
+    obj.events.on("after_update", calls.append)
+
+    batch_update(obj, prop=5)
+    assert obj.value == 5
+    assert calls == [{"prop": (0, 5)}]
+
+    with pytest.raises(AttributeError):
+        obj.events.update(prop=6)
+    assert obj.value == 5
+
+
+def test_batch_ends_on_error():
+    """test changes made before an exception are still reported"""
+    obj = _Point()
+    calls = _count_calls(obj)
+
+    with pytest.raises(KeyError):
+        with obj.batch():
+            obj.a = 1
+            raise KeyError("a")
+
+    assert calls == [({"a": (0, 1)},)]
+    obj.b = 2
+    assert len(calls) == 3
+
+
+def test_once_concurrent_triggers():
+    """test a once handler runs exactly once when several threads trigger
+    the event at the same time"""
+    for _ in range(50):
+        obs = Observable()
+        calls = []
+        errors = []
+        barrier = threading.Barrier(8)
+
+        obs.on("event", lambda: None)
+        obs.once("event", lambda: calls.append(1))
+
+        def worker():
+            barrier.wait()
+            try:
+                obs.trigger("event")
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert calls == [1]
+        assert len(obs._events["event"]) == 1
+
+
+def test_once_reentrant_trigger():
+    """test a nested trigger from a handler doesn't run once handlers of
+    the outer trigger again"""
+    obs = Observable()
+    calls = []
+
+    @obs.on("event")
+    def first():
+        calls.append("first")
+        if len(calls) == 1:
+            obs.trigger("event")
+
+    @obs.once("event")
+    def second():
+        calls.append("second")
+
+    obs.trigger("event")
+    assert calls == ["first", "first", "second"]
+
+
+def test_once_keeps_order_and_duplicates():
+    """test once handlers run in registration order and a handler
+    registered twice with once runs twice"""
+    obs = Observable()
+    calls = []
+
+    obs.on("event", lambda *args: calls.append("on"))
+    obs.once("event", calls.append, calls.append)
+
+    assert obs.trigger("event", "once")
+    assert calls == ["on", "once", "once"]
+    assert obs.trigger("event", "once")
+    assert calls == ["on", "once", "once", "on"]
+
+
+def test_off_once_handler():
+    """test once handlers can be unregistered before they fire"""
+    obs = Observable()
+
+    @obs.once("event")
+    def handler():
+        raise AssertionError("unregistered once handler called")
+
+    obs.off("event", handler)
+    assert not obs.trigger("event")
+
+
+def test_once_consumed_restores_fast_path():
+    """test an event goes back to the plain dispatch path once all its
+    once handlers were consumed or unregistered"""
+    obs = Observable()
+    obs.on("event", lambda: None)
+    handlers = obs._events["event"]
+
+    def once_handler():
+        pass
+
+    obs.once("event", once_handler)
+    obs.once("event", once_handler)
+    assert handlers._once_added != handlers._once_removed
+
+    obs.trigger("event")
+    assert handlers._once_added == handlers._once_removed
+
+    obs.once("event", once_handler)
+    obs.off("event", once_handler)
+    assert handlers._once_added == handlers._once_removed == 3
+
+
+def test_trace():
+    """test tracing records the handlers that ran for each trigger"""
+    obs = Observable()
+
+    def first():
+        pass
+
+    def second():
+        pass
+
+    obs.on("event", first)
+    obs.once("event", second)
+
+    with obs.trace() as trace:
+        obs.trigger("event")
+        obs.trigger("event")
+        obs.trigger("other")
+
+    obs.trigger("event")
+
+    assert [entry.event for entry in trace] == ["event", "event", "other"]
+    assert [[call[0] for call in entry.calls] for entry in trace] == [
+        [first, second], [first], []
+    ]
+    assert all(seconds >= 0 for entry in trace for _, seconds in entry.calls)
+
+
+def test_trace_limit():
+    """test a trace keeps the last limit entries"""
+    obs = CompactObservable()
+
+    with obs.trace(limit=2) as trace:
+        for event in "abc":
+            obs.trigger(event)
+
+    assert [entry.event for entry in trace] == ["b", "c"]
+
+
+def _pickled_handler(*args):
+    _pickled_handler.calls.append(args)
+
+
+_pickled_handler.calls = []
+
+
+@pytest.mark.parametrize("cls", [Observable, CompactObservable])
+@pytest.mark.parametrize("clone", [
+    copy.copy, copy.deepcopy, lambda obj: pickle.loads(pickle.dumps(obj))
+])
+def test_copy_and_pickle(cls, clone):
+    """test idle and populated observables can be copied and pickled"""
+    idle = clone(cls())
+    assert idle._events is cls()._events
+    assert not idle.trigger("event")
+
+    obs = cls()
+    obs.on("event", _pickled_handler)
+    obs.once("event", _pickled_handler)
+    populated = clone(obs)
+    assert populated.get_all_handlers() == {"event": [_pickled_handler, _pickled_handler]}
+
+    _pickled_handler.calls.clear()
+    assert populated.trigger("event", 1)
+    assert populated.trigger("event", 2)
+    assert _pickled_handler.calls == [(1,), (1,), (2,)]
@@ -0,0 +1,77 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def _run(code):
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        check=True, capture_output=True, text=True,
+    )
+
+
+def _loaded(code, *modules):
+    result = _run(code + "\nimport sys\nprint(' '.join(m for m in {!r} if m in sys.modules))".format(modules))
+    return result.stdout.splitlines()[-1].split()
+
+
+def test_package_import_is_lazy():
+    """test importing the package doesn't import submodules or platform"""
+    assert _loaded(
+        "import yusholib", "yusholib.events", "yusholib.logger", "yusholib.ipscan",
+        "platform", "pkgutil", "typing", "pystyle"
+    ) == []
+
+
+def test_events_import_is_lazy():
+    """test importing events doesn't import other submodules or typing"""
+    assert _loaded(
+        "import yusholib.events", "yusholib.logger", "yusholib.ipscan", "typing", "pystyle"
+    ) == []
+
+
+def test_logger_import_is_lazy():
+    """test pystyle is only imported once something is coloured"""
+    assert _loaded("import yusholib.logger", "pystyle") == []
+    assert _loaded(
+        "from yusholib.logger import Logger, MemorySink\n"
+        "Logger('info', sinks=[MemorySink()]).info('x')", "pystyle"
+    ) == []
+    pytest.importorskip("pystyle")
+    assert _loaded("from yusholib.logger import Logger\nLogger('info').info('x')", "pystyle") == ["pystyle"]
+
+
+def test_submodule_attribute_access():
+    """test submodules are loaded on attribute access"""
+    result = _run(
+        "import yusholib\n"
+        "print(yusholib.events.Observable.__name__)\n"
+        "print(yusholib.version_info.micro)\n"
+        "yusholib.show_version()"
+    )
+    lines = result.stdout.splitlines()
+    assert lines[:2] == ["Observable", "3"]
+    assert lines[3].startswith("* yusholib v0.0.3-alpha")
+
+    with pytest.raises(subprocess.CalledProcessError):
+        _run("import yusholib\nyusholib.missing")
+
+
+def test_type_hints_resolve():
+    """test annotations resolve at runtime although typing isn't imported
+    up front"""
+    result = _run(
+        "import inspect, sys\n"
+        "from yusholib import events\n"
+        "assert 'typing' not in sys.modules\n"
+        "import typing\n"
+        "for cls in (events.CompactObservable, events.Observable, events.ObservableProperty,\n"
+        "            events.HandlerNotFound, events.EventNotFound):\n"
+        "    for name, func in inspect.getmembers(cls, inspect.isfunction):\n"
+        "        # deleter/getter/setter wrap property's methods, which have no globals\n"
+        "        if func.__module__ == events.__name__ and not hasattr(func, '__wrapped__'):\n"
+        "            typing.get_type_hints(func)\n"
+        "print(typing.get_type_hints(events.Observable.on)['handlers'])"
+    )
+    assert result.stdout.strip() == "typing.Callable"
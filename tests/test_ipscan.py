@@ -0,0 +1,149 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from yusholib.ipscan import HostStateCache, IpRange, IpRangeScanner, TokenBucket, ip_to_int
+
+
+def test_ip_range():
+    """test ranges carry over octet boundaries"""
+    ip_range = IpRange("10.0.0.254", "10.0.1.1")
+
+    assert ip_range.ip_range == ["10.0.0.254", "10.0.0.255", "10.0.1.0", "10.0.1.1"]
+
+
+def test_single_ip_range():
+    """test a range with the same start and end"""
+    assert IpRange("127.0.0.1", "127.0.0.1").ip_range == ["127.0.0.1"]
+
+
+@pytest.mark.parametrize("start, end", [
+    ("10.0.0.256", "10.0.1.1"),
+    ("10.0.0", "10.0.1.1"),
+    ("10.0.0.1", "10.0.0.1.1"),
+    ("10.0.1.1", "10.0.0.1"),
+])
+def test_invalid_ip_range(start, end):
+    """test invalid addresses and reversed ranges are rejected"""
+    with pytest.raises(ValueError):
+        IpRange(start, end)
+
+
+def test_token_bucket_paces_threads():
+    """test a shared bucket limits the combined rate of all threads"""
+    bucket = TokenBucket(rate=200, burst=5)
+
+    def worker():
+        for _ in range(5):
+            bucket.acquire()
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 5 tokens of burst, the other 20 are due one every 5ms
+    assert time.monotonic() - started >= 20 / 200 * 0.9
+
+
+def test_token_bucket_invalid():
+    """test invalid rates are rejected"""
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=10, burst=0)
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    yield sock.getsockname()[1]
+    sock.close()
+
+
+def test_paced_scan(listener, tmp_path):
+    """test a paced scan with several workers finds the open host and
+    stays at the target rate"""
+    result_file = tmp_path / "result.txt"
+    scanner = IpRangeScanner(IpRange("127.0.0.1", "127.0.0.20"), listener,
+                             str(result_file), workers=4, rate=200, burst=1)
+
+    scanner.scan()
+
+    assert result_file.read_text() == "127.0.0.1\n"
+    assert scanner.probes == 20
+    assert scanner.elapsed >= 19 / 200 * 0.9
+    assert scanner.achieved_rate <= 200 * 1.1
+
+
+def test_host_state_cache_roundtrip(tmp_path):
+    """test the cache file keeps every host's state"""
+    path = tmp_path / "hosts.bin"
+    cache = HostStateCache(path, 80)
+    assert cache.update(ip_to_int("10.0.0.1"), True, 100.0) is None
+    assert cache.update(ip_to_int("10.0.0.2"), False, 100.0) is None
+    assert cache.update(ip_to_int("10.0.0.2"), False, 200.0) is False
+    cache.save()
+
+    loaded = HostStateCache(path, 80)
+    assert loaded.hosts == {
+        ip_to_int("10.0.0.1"): (True, 100.0, 100.0),
+        ip_to_int("10.0.0.2"): (False, 200.0, 100.0),
+    }
+
+    with pytest.raises(ValueError):
+        HostStateCache(path, 443)
+
+
+def test_scanner_rejects_cache_of_another_port(tmp_path):
+    """test a cache can only be used to scan its own port"""
+    cache = HostStateCache(tmp_path / "hosts.bin", 80)
+
+    with pytest.raises(ValueError):
+        IpRangeScanner(IpRange("127.0.0.1", "127.0.0.1"), 1, str(tmp_path / "result.txt"), cache=cache)
+
+
+def test_host_state_cache_due():
+    """test closed and long-dead hosts are probed less often"""
+    cache = HostStateCache("unused", 80, closed_ttl=60, dead_after=3600, dead_ttl=600)
+    cache.update(1, True, 0.0)
+    cache.update(2, False, 0.0)
+
+    assert cache.due(1, 1.0)
+    assert cache.due(3, 1.0)
+    assert not cache.due(2, 30.0)
+    assert cache.due(2, 60.0)
+
+    cache.update(2, False, 3600.0)
+    assert not cache.due(2, 3900.0)
+    assert cache.due(2, 4200.0)
+
+
+def test_incremental_scan(tmp_path):
+    """test rescans report newly open and newly closed hosts and skip
+    hosts that aren't due"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(16)
+    port = sock.getsockname()[1]
+    result_file = str(tmp_path / "result.txt")
+    cache_file = str(tmp_path / "hosts.bin")
+
+    def scan():
+        cache = HostStateCache(cache_file, port, closed_ttl=3600)
+        scanner = IpRangeScanner(IpRange("127.0.0.1", "127.0.0.3"), port,
+                                 result_file, cache=cache)
+        return scanner.scan(), scanner.probes
+
+    assert scan() == ((["127.0.0.1"], []), 3)
+    # the closed hosts aren't due again within closed_ttl
+    assert scan() == (([], []), 1)
+
+    sock.close()
+    assert scan() == (([], ["127.0.0.1"]), 1)
@@ -0,0 +1,408 @@
+import gc
+import json
+import subprocess
+import sys
+import threading
+import time
+import weakref
+
+import pytest
+
+from yusholib.events import Observable
+from yusholib.logger import (
+    FileSink, JsonLinesSink, Logger, LogRecord, MemorySink, RateLimiter, RotatingFileSink
+)
+
+
+def test_format_args(capsys):
+    """test message formatting with positional and keyword arguments"""
+    log = Logger('info', hide_time=True)
+
+    log.info("{} of {total}", 1, total=2)
+
+    assert capsys.readouterr().out == f"{Logger.inf_prefix}1 of 2{Logger.re}\n"
+
+
+def test_plain_message_is_not_formatted(capsys):
+    """test braces in a message without arguments are left alone"""
+    log = Logger('info', hide_time=True)
+
+    log.info("{not a field}")
+
+    assert "{not a field}" in capsys.readouterr().out
+
+
+def test_callable_message(capsys):
+    """test zero-arg callables are called for their text"""
+    log = Logger('debug', hide_time=True)
+
+    log.debug(lambda: "built lazily")
+
+    assert "built lazily" in capsys.readouterr().out
+
+
+def test_other_callables_are_not_called():
+    """test classes, exception types, bound methods and functions with
+    parameters are logged as their str()"""
+    sink = MemorySink()
+    log = Logger('info', hide_time=True, sinks=[sink])
+
+    class Payload:
+        def __init__(self):
+            raise AssertionError("class instantiated by the logger")
+
+        def describe(self):
+            raise AssertionError("bound method called by the logger")
+
+    def needs_args(a, b=1):
+        raise AssertionError("function called by the logger")
+
+    method = object.__new__(Payload).describe
+    for message in (ValueError, dict, Payload, method, needs_args):
+        log.error(message)
+
+    assert list(sink.lines) == [
+        f"ERROR   :: {message}" for message in (ValueError, dict, Payload, method, needs_args)
+    ]
+
+
+def test_disabled_level_is_not_formatted(capsys):
+    """test nothing is rendered for disabled levels"""
+    log = Logger('warn', hide_time=True)
+
+    def payload():
+        raise AssertionError("payload built for a disabled level")
+
+    log.debug(payload)
+    log.info("{}", payload)
+    assert capsys.readouterr().out == ""
+
+
+def test_is_enabled():
+    """test is_enabled with level names and numbers"""
+    log = Logger('info')
+
+    assert log.is_enabled('error')
+    assert log.is_enabled('success')
+    assert log.is_enabled(2)
+    assert not log.is_enabled('debug')
+    assert not log.is_enabled(3)
+
+
+def test_invalid_level():
+    """test unknown level names are rejected"""
+    with pytest.raises(ValueError):
+        Logger('verbose')
+
+
+def test_timestamp_is_cached_per_second(capsys, monkeypatch):
+    """test the timestamp is rendered once per second and matches strftime"""
+    log = Logger('info')
+    calls = []
+    strftime = time.strftime
+
+    def counting_strftime(fmt, t):
+        calls.append(t)
+        return strftime(fmt, t)
+
+    now = 1700000000.25
+    monkeypatch.setattr(time, "time", lambda: now)
+    monkeypatch.setattr(time, "strftime", counting_strftime)
+
+    log.info("a")
+    log.info("b")
+    assert len(calls) == 1
+
+    now += 1
+    log.info("c")
+    assert len(calls) == 2
+
+    expected = strftime(log.timestamp_format, time.localtime(int(now)))
+    assert capsys.readouterr().out.splitlines()[-1].startswith(f"{Logger.gr}[{expected}] ")
+
+
+def test_timestamp_follows_format_changes(capsys):
+    """test changing timestamp_format takes effect immediately"""
+    log = Logger('info')
+
+    log.info("a")
+    log.timestamp_format = "fixed"
+    log.info("b")
+
+    assert capsys.readouterr().out.splitlines()[-1].startswith(f"{Logger.gr}[fixed] ")
+
+
+def test_hidden_time_skips_rendering(capsys, monkeypatch):
+    """test no timestamp work is done when time is hidden"""
+    log = Logger('info', hide_time=True)
+
+    def fail(*args):
+        raise AssertionError("timestamp rendered while hidden")
+
+    monkeypatch.setattr(time, "strftime", fail)
+    log.info("a")
+
+    assert capsys.readouterr().out == f"{Logger.inf_prefix}a{Logger.re}\n"
+
+
+def test_memory_sink_is_plain():
+    """test sinks without colour get no escape sequences"""
+    sink = MemorySink(capacity=2)
+    log = Logger('info', hide_time=True, sinks=[sink])
+
+    log.error("a")
+    log.info("b")
+    log.warn("c")
+
+    assert list(sink.lines) == ["INFO    :: b", "WARN    :: c"]
+
+
+def test_memory_sink_timestamp():
+    """test plain sinks render the timestamp without colour"""
+    sink = MemorySink()
+    log = Logger('info', timestamp_format="stamp", sinks=[sink])
+
+    log.info("a")
+
+    assert list(sink.lines) == ["[stamp] INFO    :: a"]
+
+
+def test_file_sink_buffers(tmp_path):
+    """test file sinks write in bulk once the buffer is full or flushed"""
+    path = tmp_path / "log.txt"
+    sink = FileSink(str(path), buffer_size=1024)
+    log = Logger('info', hide_time=True, sinks=[sink])
+
+    log.info("a")
+    log.error("b")
+    assert path.read_text() == ""
+
+    log.flush()
+    assert path.read_text() == "INFO    :: a\nERROR   :: b\n"
+
+    log.info("x" * 2048)
+    assert path.read_text().endswith("x\n")
+    log.close()
+
+
+def test_dropped_file_sinks_are_released(tmp_path):
+    """test sinks dropped without close() are collected and write their
+    buffered lines"""
+    sinks = [FileSink(str(tmp_path / "log{}.txt".format(i))) for i in range(100)]
+    refs = [weakref.ref(sink) for sink in sinks]
+    sinks[0].write("kept")
+
+    del sinks
+    gc.collect()
+
+    assert not any(ref() for ref in refs)
+    assert (tmp_path / "log0.txt").read_text() == "kept\n"
+
+
+def test_rotating_file_sink_size(tmp_path):
+    """test rotation once the file would grow past max_bytes"""
+    path = tmp_path / "log.txt"
+    sink = RotatingFileSink(str(path), max_bytes=30, backup_count=2, buffer_size=0)
+    log = Logger('info', hide_time=True, sinks=[sink])
+
+    for i in range(4):
+        log.info("line {}", i)
+    log.close()
+
+    assert path.read_text() == "INFO    :: line 3\n"
+    assert (tmp_path / "log.txt.1").read_text() == "INFO    :: line 2\n"
+    assert (tmp_path / "log.txt.2").read_text() == "INFO    :: line 1\n"
+    assert not (tmp_path / "log.txt.3").exists()
+
+
+def test_rotating_file_sink_interval(tmp_path, monkeypatch):
+    """test rotation once the interval has passed"""
+    now = 1000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    path = tmp_path / "log.txt"
+    sink = RotatingFileSink(str(path), interval=60)
+    log = Logger('info', hide_time=True, sinks=[sink])
+
+    log.info("old")
+    now += 61
+    log.info("new")
+    log.close()
+
+    assert path.read_text() == "INFO    :: new\n"
+    assert (tmp_path / "log.txt.1").read_text() == "INFO    :: old\n"
+
+
+def test_json_lines_sink(tmp_path, monkeypatch):
+    """test structured output"""
+    monkeypatch.setattr(time, "time", lambda: 1000.5)
+    path = tmp_path / "log.jsonl"
+    log = Logger('info', sinks=[JsonLinesSink(str(path))])
+
+    log.warn("{} failed", "job")
+    log.close()
+
+    assert json.loads(path.read_text()) == {"time": 1000.5, "level": "warn", "message": "job failed"}
+
+
+def test_rate_limit_per_template(monkeypatch):
+    """test messages sharing a template share a token bucket"""
+    now = 1000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    sink = MemorySink()
+    log = Logger('info', hide_time=True, sinks=[sink], rate_limiter=RateLimiter(rate=1, burst=2))
+
+    for i in range(5):
+        log.error("failed {}", i)
+    log.error("other")
+    assert list(sink.lines) == ["ERROR   :: failed 0", "ERROR   :: failed 1", "ERROR   :: other"]
+
+    now += 1
+    log.error("failed {}", 5)
+    assert sink.lines[-1] == "ERROR   :: failed 5 (3 similar messages suppressed)"
+
+
+def test_rate_limit_per_site():
+    """test call sites get their own token bucket"""
+    sink = MemorySink()
+    log = Logger('info', hide_time=True, sinks=[sink], rate_key='site',
+                 rate_limiter=RateLimiter(rate=0, burst=1))
+
+    for i in range(3):
+        log.info("a {}", i)
+        log.info("a {}", i)
+
+    assert list(sink.lines) == ["INFO    :: a 0", "INFO    :: a 0"]
+
+
+def test_rate_limiter_is_bounded():
+    """test only max_keys buckets are kept"""
+    limiter = RateLimiter(rate=0, burst=1, max_keys=2)
+
+    assert limiter.allow("a", 0) == 0
+    assert limiter.allow("b", 0) == 0
+    assert limiter.allow("a", 0) is None
+    assert limiter.allow("c", 0) == 0
+    assert len(limiter._buckets) == 2
+    # "b" was the least recently used key and got evicted
+    assert limiter.allow("b", 0) == 0
+
+
+def test_collapse_duplicates():
+    """test repeated messages are collapsed into a summary line"""
+    sink = MemorySink()
+    log = Logger('info', hide_time=True, sinks=[sink], collapse_duplicates=True)
+
+    for _ in range(4):
+        log.error("boom")
+    log.info("done")
+    log.info("done")
+    log.flush()
+
+    assert list(sink.lines) == [
+        "ERROR   :: boom",
+        "ERROR   :: last message repeated 3 times",
+        "INFO    :: done",
+        "INFO    :: last message repeated 1 times",
+    ]
+
+
+def test_collapse_duplicates_across_threads():
+    """test concurrent repeats are all counted exactly once"""
+    sink = MemorySink(capacity=100000)
+    log = Logger('info', hide_time=True, sinks=[sink], collapse_duplicates=True)
+
+    def burst():
+        for i in range(4000):
+            log.error("boom" if i % 100 else "tick")
+
+    threads = [threading.Thread(target=burst) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    log.flush()
+
+    total = 0
+    for line in sink.lines:
+        message = line.split(":: ", 1)[1]
+        if message.startswith("last message repeated "):
+            total += int(message.split()[3])
+        else:
+            total += 1
+    assert total == 8 * 4000
+
+
+def test_collapsing_logger_is_not_kept_alive():
+    """test loggers collapsing duplicates can still be collected"""
+    log = Logger('info', hide_time=True, sinks=[MemorySink()], collapse_duplicates=True)
+    ref = weakref.ref(log)
+
+    del log
+    gc.collect()
+
+    assert ref() is None
+
+
+def test_observable_records():
+    """test log calls are triggered as structured records"""
+    obs = Observable()
+    log = Logger('info', sinks=[], observable=obs)
+    records = []
+
+    obs.on("log.error", records.append)
+    obs.on("log", records.append)
+
+    log.error("{} failed", "job", code=3)
+    log.info("not subscribed")
+
+    error, generic, info = records
+    assert error is generic
+    assert isinstance(error, LogRecord)
+    assert (error.level, error.message, error.template) == ("error", "job failed", "{} failed")
+    assert error.args == ("job",)
+    assert error.kwargs == {"code": 3}
+    assert info.level == "info"
+
+
+def test_observable_without_subscribers():
+    """test nothing is built or triggered without subscribers"""
+
+    class Obs(Observable):
+        def trigger(self, event, *args, **kw):
+            raise AssertionError("triggered without subscribers")
+
+    sink = MemorySink()
+    log = Logger('info', hide_time=True, sinks=[sink], observable=Obs())
+
+    log.error("a {}", 1)
+
+    assert list(sink.lines) == ["ERROR   :: a 1"]
+
+
+def test_rate_limit_non_str_messages():
+    """test messages that are neither str nor callable share a bucket per
+    type and unhashable ones don't break the limiter"""
+    limiter = RateLimiter(rate=0, burst=1)
+    sink = MemorySink()
+    log = Logger('info', hide_time=True, sinks=[sink], rate_limiter=limiter)
+
+    log.error({'a': 1})
+    log.error({'b': 2})
+    log.error(ValueError("first"))
+    log.error(ValueError("second"))
+
+    assert list(sink.lines) == ["ERROR   :: {'a': 1}", "ERROR   :: first"]
+    assert len(limiter._buckets) == 2
+
+
+def test_collapsed_repeats_flushed_at_exit(tmp_path):
+    """test held repeats are written when the process exits"""
+    path = tmp_path / "log.txt"
+    subprocess.run([sys.executable, "-c", (
+        "from yusholib.logger import FileSink, Logger\n"
+        "log = Logger('info', hide_time=True, sinks=[FileSink({!r})], collapse_duplicates=True)\n"
+        "for _ in range(3):\n"
+        "    log.error('boom')\n"
+    ).format(str(path))], check=True)
+
+    assert path.read_text() == "ERROR   :: boom\nERROR   :: last message repeated 2 times\n"
@@ -3,26 +3,48 @@ __author__ = "yusho"
 __license__ = "MIT"
 __version__ = "0.0.1a"
 
-__path__ = __import__('pkgutil').extend_path(__path__, __name__)
+import sys
+from collections import namedtuple
 
-import platform, sys
-from typing import Literal, NamedTuple
-from . import *
+# Type checkers see the typed NamedTuple, importing typing at runtime would
+# make up most of the time it takes to import this package.
+TYPE_CHECKING = False
 
-class VersionInfo(NamedTuple):
-    major: int
-    minor: int
-    micro: int
-    releaselevel: Literal["alpha", "beta", "candidate", "final"]
-    serial: int
+# Submodules (and their dependencies) are only imported on first access
+# through __getattr__, see PEP 562.
+__all__ = ["events", "ipscan", "logger", "show_version", "version_info", "VersionInfo"]
+_submodules = ("events", "ipscan", "logger")
+
+if TYPE_CHECKING:
+    from typing import Literal, NamedTuple
+
+    class VersionInfo(NamedTuple):
+        major: int
+        minor: int
+        micro: int
+        releaselevel: Literal["alpha", "beta", "candidate", "final"]
+        serial: int
+else:
+    class VersionInfo(namedtuple("VersionInfo", "major minor micro releaselevel serial")):
+        __slots__ = ()
 
 version_info: VersionInfo = VersionInfo(major=0, minor=0, micro=3, releaselevel='alpha', serial=0)
 
+def __getattr__(name):
+    if name in _submodules:
+        import importlib
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+def __dir__():
+    return sorted(set(globals()) | set(_submodules))
+
 def show_version() -> None:
+    import platform
     lines = []
     lines.append("* Python v{0.major}.{0.minor}.{0.micro}-{0.releaselevel}".format(sys.version_info))
     lines.append("* yusholib v{0.major}.{0.minor}.{0.micro}-{0.releaselevel}".format(version_info))
     uname = platform.uname()
     lines.append('* system info: {0.system} {0.release} {0.version}'.format(uname))
     print("\n".join(lines))
-    return lines # type: ignore
\ No newline at end of file
+    return lines # type: ignore
@@ -2,10 +2,31 @@
     Event system for python
 """
 
-import typing as T
+from __future__ import annotations
+
+import _thread
 import functools
+import itertools
+import time
+
+from collections import defaultdict, deque, namedtuple
+
+# Importing typing would double the time it takes to import this module.
+# Annotations aren't evaluated (see the __future__ import), so T only
+# imports typing once something like typing.get_type_hints() resolves them.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    import typing as T
+else:
+    class _LazyTyping:
+        """Stands in for the typing module until an attribute is used."""
 
-from collections import defaultdict
+        def __getattr__(self, name: str) -> object:
+            import typing
+            globals()["T"] = typing
+            return getattr(typing, name)
+
+    T = _LazyTyping()
 
 
 class HandlerNotFound(Exception):
@@ -31,11 +52,137 @@ class EventNotFound(Exception):
         return "Event {} wasn't found".format(self.event)
 
 
-class Observable:
-    """Event system for python"""
+# Registration tokens, once() registrations get negative ones.
+_tokens = itertools.count(1)
+# Guards the once() counters of all _Handlers.
+_once_lock = _thread.allocate_lock()
+
+
+class _Handlers:
+    """Handlers of one event in registration order.
+    Every registration is stored under its own token, which lets a trigger
+    consume once() registrations with a single atomic dict.pop()."""
+
+    __slots__ = ("_entries", "_once_added", "_once_removed")
+
+    def __init__(self) -> None:
+        self._entries = {}  # type: T.Dict[int, T.Callable]
+        # Counted before adding and after removing once() registrations, so
+        # while both are equal, no once() registration can be in _entries.
+        self._once_added = 0
+        self._once_removed = 0
+
+    def __iter__(self) -> T.Iterator[T.Callable]:
+        return iter(list(self._entries.values()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, handler: T.Any) -> bool:
+        return handler in self._entries.values()
+
+    def extend(self, handlers: T.Iterable[T.Callable]) -> None:
+        for handler in handlers:
+            self._entries[next(_tokens)] = handler
+
+    def extend_once(self, handlers: T.Sequence[T.Callable]) -> None:
+        with _once_lock:
+            self._once_added += len(handlers)
+        for handler in handlers:
+            self._entries[-next(_tokens)] = handler
+
+    def remove(self, handler: T.Callable) -> None:
+        """Removes every registration of the given handler."""
+
+        removed = 0
+        for token, registered in list(self._entries.items()):
+            if registered == handler and self._entries.pop(token, None) is not None:
+                removed += token < 0
+        if removed:
+            with _once_lock:
+                self._once_removed += removed
+
+    def __getstate__(self) -> T.List[T.Tuple[bool, T.Callable]]:
+        # tokens are only unique within this process, they are handed out
+        # again when unpickling
+        return [(token < 0, handler) for token, handler in self._entries.items()]
+
+    def __setstate__(self, state: T.List[T.Tuple[bool, T.Callable]]) -> None:
+        self.__init__()  # type: ignore
+        for once, handler in state:
+            if once:
+                self.extend_once((handler,))
+            else:
+                self.extend((handler,))
+
+    def claim(self) -> T.List[T.Callable]:
+        """Returns the handlers a trigger has to call and consumes the
+        once() registrations among them. A once() registration is only
+        returned to the one trigger that removed it."""
+
+        removed = self._once_removed
+        entries = self._entries
+        callbacks = list(entries.values())
+        if self._once_added == removed:
+            return callbacks
+
+        callbacks = []
+        claimed = 0
+        for token, handler in list(entries.items()):
+            if token > 0:
+                callbacks.append(handler)
+            elif entries.pop(token, None) is not None:
+                callbacks.append(handler)
+                claimed += 1
+        if claimed:
+            with _once_lock:
+                self._once_removed += claimed
+        return callbacks
+
+
+TraceEntry = namedtuple("TraceEntry", "event calls")
+TraceEntry.__doc__ = """A traced trigger: the event and a list of
+(handler, seconds) tuples of the handlers that ran."""
+
+
+class _NoEvents(dict):
+    """Read-only empty handler map, copies and pickles of it refer to the
+    shared _NO_EVENTS instance."""
+
+    __slots__ = ()
+
+    def _read_only(self, *args: T.Any, **kw: T.Any) -> None:
+        raise TypeError("the shared empty handler map is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only  # type: ignore
+    clear = pop = popitem = setdefault = update = _read_only  # type: ignore
+
+    def __reduce__(self) -> str:
+        return "_NO_EVENTS"
+
+
+# Shared handler map of every Observable without handlers. The real map is
+# only allocated when the first handler is registered.
+_NO_EVENTS = _NoEvents()  # type: T.Mapping[str, _Handlers]
+
+
+class CompactObservable:
+    """Memory-compact event system for python
+
+    Instances have neither __dict__ nor __weakref__, one without handlers
+    only costs the pointer to the shared empty handler map."""
+
+    __slots__ = ("_events",)
 
     def __init__(self) -> None:
-        self._events = defaultdict(list)  # type: T.DefaultDict[str, T.List[T.Callable]]
+        self._events = _NO_EVENTS  # type: T.Mapping[str, _Handlers]
+
+    def _writable_events(self) -> T.DefaultDict[str, _Handlers]:
+        """Returns the handler map, allocating it on first use."""
+
+        if self._events is _NO_EVENTS:
+            self._events = defaultdict(_Handlers)
+        return self._events  # type: ignore
 
     def get_all_handlers(self) -> T.Dict[str, T.List[T.Callable]]:
         """Returns a dict with event names as keys and lists of
@@ -51,11 +198,18 @@ class Observable:
 
         return list(self._events.get(event, []))
 
+    def has_handlers(self, event: str) -> bool:
+        """Returns whether any handler is registered for the given event.
+        Unlike get_handlers() this doesn't copy the handler list."""
+
+        handlers = self._events.get(event)
+        return handlers is not None and bool(handlers._entries)  # pylint: disable=protected-access
+
     def is_registered(self, event: str, handler: T.Callable) -> bool:
         """Returns whether the given handler is registered for the
         given event."""
 
-        return handler in self._events.get(event, [])
+        return handler in self._events.get(event, ())
 
     def on(  # pylint: disable=invalid-name
             self, event: str, *handlers: T.Callable
@@ -65,7 +219,7 @@ class Observable:
 
         def _on_wrapper(*handlers: T.Callable) -> T.Callable:
             """wrapper for on decorator"""
-            self._events[event].extend(handlers)
+            self._writable_events()[event].extend(handlers)
             return handlers[0]
 
         if handlers:
@@ -81,7 +235,7 @@ class Observable:
         Raises HandlerNotFound when a given handler isn't registered."""
 
         if not event:
-            self._events.clear()
+            self._events = _NO_EVENTS
             return
 
         if event not in self._events:
@@ -94,43 +248,158 @@ class Observable:
         for callback in handlers:
             if callback not in self._events[event]:
                 raise HandlerNotFound(event, callback)
-            while callback in self._events[event]:
-                self._events[event].remove(callback)
+            self._events[event].remove(callback)
         return
 
     def once(self, event: str, *handlers: T.Callable) -> T.Callable:
         """Registers one or more handlers to a specified event, but
-        removes them when the event is first triggered.
+        removes them when the event is first triggered. Even when several
+        threads trigger the event at once, each handler runs only once.
         This method may as well be used as a decorator for the handler."""
 
         def _once_wrapper(*handlers: T.Callable) -> T.Callable:
             """Wrapper for 'once' decorator"""
-
-            def _wrapper(*args: T.Any, **kw: T.Any) -> None:
-                """Wrapper that unregisters itself before executing
-                the handlers"""
-
-                self.off(event, _wrapper)
-                for handler in handlers:
-                    handler(*args, **kw)
-
-            return _wrapper
+            self._writable_events()[event].extend_once(handlers)
+            return handlers[0]
 
         if handlers:
-            return self.on(event, _once_wrapper(*handlers))
-        return lambda x: self.on(event, _once_wrapper(x))
+            return _once_wrapper(*handlers)
+        return _once_wrapper
 
     def trigger(self, event: str, *args: T.Any, **kw: T.Any) -> bool:
         """Triggers all handlers which are subscribed to an event.
         Returns True when there were callbacks to execute, False otherwise."""
 
-        callbacks = list(self._events.get(event, []))
-        if not callbacks:
+        if _traces:
+            trace = _traces.get(id(self))
+            if trace is not None:
+                return self._trigger_traced(trace, event, args, kw)
+
+        handlers = self._events.get(event)
+        if handlers is None:
             return False
 
+        # claim() inlined for the common case without once() registrations
+        removed = handlers._once_removed  # pylint: disable=protected-access
+        callbacks = list(handlers._entries.values())  # pylint: disable=protected-access
+        if handlers._once_added != removed:  # pylint: disable=protected-access
+            callbacks = handlers.claim()
+        for callback in callbacks:
+            callback(*args, **kw)
+        return bool(callbacks)
+
+    def _trigger_traced(
+            self, trace: T.Deque[TraceEntry], event: str,
+            args: T.Tuple[T.Any, ...], kw: T.Dict[str, T.Any]
+    ) -> bool:
+        """trigger() recording the handlers that ran in trace"""
+
+        handlers = self._events.get(event)
+        callbacks = handlers.claim() if handlers is not None else []
+        calls = []  # type: T.List[T.Tuple[T.Callable, float]]
+        trace.append(TraceEntry(event, calls))
         for callback in callbacks:
+            started = time.perf_counter()
             callback(*args, **kw)
-        return True
+            calls.append((callback, time.perf_counter() - started))
+        return bool(callbacks)
+
+    def trace(self, limit: int = None) -> "_Trace":  # type: ignore
+        """Returns a context manager that records a TraceEntry for every
+        trigger on this Observable while it is active. Entering it returns
+        the deque the entries are appended to, holding at most limit
+        entries when a limit is given."""
+
+        return _Trace(self, limit)
+
+    def batch(self) -> "_Batch":
+        """Returns a context manager that suspends the before_set_* and
+        after_set_* events of ObservableProperties using this Observable.
+        When the outermost batch exits, a single after_update event is
+        triggered with a dict mapping every assigned property's event name
+        to an (old value, new value) tuple.
+        A batch only applies to assignments made by the thread that
+        opened it, other threads trigger their events as usual. When the
+        properties live on another object (see the observable keyword
+        argument of ObservableProperty), assign them on that object within
+        the batch or use batch_update()."""
+
+        return _Batch(self)
+
+    def update(self, **fields: T.Any) -> None:
+        """Assigns the given ObservableProperties of this object within a
+        batch, see batch_update()."""
+
+        batch_update(self, **fields)
+
+
+# Active batches by id() of their Observable and the thread that opened
+# them, so a batch only defers assignments made by that thread. A batch
+# keeps its Observable alive so the id can't be reused while it is in here.
+_batches = {}  # type: T.Dict[T.Tuple[int, int], _Batch]
+
+
+class _Batch:
+    """Context manager returned by CompactObservable.batch()"""
+
+    __slots__ = ("observable", "changes", "depth")
+
+    def __init__(self, observable: CompactObservable) -> None:
+        self.observable = observable
+        self.changes = {}  # type: T.Dict[str, T.Tuple[T.Any, T.Any]]
+        self.depth = 0
+
+    def __enter__(self) -> T.Dict[str, T.Tuple[T.Any, T.Any]]:
+        batch = _batches.setdefault((id(self.observable), _thread.get_ident()), self)
+        batch.depth += 1
+        return batch.changes
+
+    def __exit__(self, *exc_info: T.Any) -> None:
+        key = (id(self.observable), _thread.get_ident())
+        batch = _batches[key]
+        batch.depth -= 1
+        if batch.depth:
+            return
+        del _batches[key]
+        if batch.changes:
+            self.observable.trigger("after_update", batch.changes)
+
+
+# Active traces by id() of their Observable, unlike batches they record
+# triggers from every thread.
+_traces = {}  # type: T.Dict[int, T.Deque[TraceEntry]]
+
+
+class _Trace:
+    """Context manager returned by CompactObservable.trace()"""
+
+    __slots__ = ("observable", "entries", "previous")
+
+    def __init__(self, observable: CompactObservable, limit: T.Optional[int]) -> None:
+        self.observable = observable
+        self.entries = deque(maxlen=limit)  # type: T.Deque[TraceEntry]
+        self.previous = None  # type: T.Optional[T.Deque[TraceEntry]]
+
+    def __enter__(self) -> T.Deque[TraceEntry]:
+        key = id(self.observable)
+        self.previous = _traces.get(key)
+        _traces[key] = self.entries
+        return self.entries
+
+    def __exit__(self, *exc_info: T.Any) -> None:
+        key = id(self.observable)
+        if self.previous is None:
+            del _traces[key]
+        else:
+            _traces[key] = self.previous
+
+
+class Observable(CompactObservable):
+    """Event system for python
+
+    Unlike CompactObservable, instances support arbitrary attributes and
+    weak references."""
+
 
 def _preserve_settings(method: T.Callable) -> T.Callable:
     """Decorator that ensures ObservableProperty-specific attributes
@@ -156,7 +425,7 @@ class ObservableProperty(property):
 
     def __init__(
             self, *args: T.Any,
-            event: str = None, observable: T.Union[Observable, str] = None, # type: ignore
+            event: str = None, observable: T.Union[CompactObservable, str] = None, # type: ignore
             **kwargs: T.Any
     ) -> None:
         super().__init__(*args, **kwargs)
@@ -181,12 +450,46 @@ class ObservableProperty(property):
         return value
 
     def __set__(self, instance: T.Any, value: T.Any) -> None:
+        if _batches and self.fset is not None:
+            batch = _batches.get((id(self._get_observable(instance)), _thread.get_ident()))
+            if batch is not None:
+                self._record_change(batch, instance, value)
+                return
         if self.fset is not None:
             self._trigger_event(instance, self.fset.__name__,
                                 "before_set", value)
         super().__set__(instance, value)
         self._trigger_event(instance, self.fset.__name__, "after_set", value) # type: ignore
 
+    def _record_change(self, batch: _Batch, holder: T.Any, value: T.Any) -> None:
+        """Sets the value without triggering events and records the change
+        in the given batch. The first old value of a property is kept when
+        it is assigned several times."""
+
+        name = self.fset.__name__ if self.event is None else self.event  # type: ignore
+        old = self.fget(holder) if self.fget is not None else None
+        super().__set__(holder, value)
+        if name in batch.changes:
+            old = batch.changes[name][0]
+        batch.changes[name] = (old, value)
+
+    def _get_observable(self, holder: T.Any) -> CompactObservable:
+        """Returns the Observable object events of the given holder are
+        triggered on."""
+
+        if isinstance(self.observable, CompactObservable):
+            return self.observable
+        if isinstance(self.observable, str):
+            return getattr(holder, self.observable)
+        if isinstance(holder, CompactObservable):
+            return holder
+        raise TypeError(
+            "This ObservableProperty is no member of an Observable "
+            "object. Specify where to find the Observable object for "
+            "triggering events with the observable keyword argument "
+            "when initializing the ObservableProperty."
+        )
+
     def _trigger_event(
             self, holder: T.Any, alt_name: str, action: str, *event_args: T.Any
     ) -> None:
@@ -196,20 +499,7 @@ class ObservableProperty(property):
         prepended to the event name and event_args are passed through
         to the registered event handlers."""
 
-        if isinstance(self.observable, Observable):
-            observable = self.observable
-        elif isinstance(self.observable, str):
-            observable = getattr(holder, self.observable)
-        elif isinstance(holder, Observable):
-            observable = holder
-        else:
-            raise TypeError(
-                "This ObservableProperty is no member of an Observable "
-                "object. Specify where to find the Observable object for "
-                "triggering events with the observable keyword argument "
-                "when initializing the ObservableProperty."
-            )
-
+        observable = self._get_observable(holder)
         name = alt_name if self.event is None else self.event
         event = "{}_{}".format(action, name)
         observable.trigger(event, *event_args)
@@ -220,9 +510,39 @@ class ObservableProperty(property):
 
     @classmethod
     def create_with(
-            cls, event: str = None, observable: T.Union[str, Observable] = None # type: ignore
+            cls, event: str = None, observable: T.Union[str, CompactObservable] = None # type: ignore
     ) -> T.Callable[..., "ObservableProperty"]:
         """Creates a partial application of ObservableProperty with
         event and observable preset."""
 
-        return functools.partial(cls, event=event, observable=observable)
\ No newline at end of file
+        return functools.partial(cls, event=event, observable=observable)
+
+
+def batch_update(holder: T.Any, **fields: T.Any) -> None:
+    """Assigns the given ObservableProperties of holder within a batch of
+    every Observable they trigger events on, so each of them gets a single
+    after_update event.
+    Raises AttributeError before assigning anything if a name isn't an
+    ObservableProperty of the holder's class."""
+
+    observables = {}  # type: T.Dict[int, CompactObservable]
+    for name in fields:
+        prop = getattr(type(holder), name, None)
+        if not isinstance(prop, ObservableProperty):
+            raise AttributeError("{} has no ObservableProperty {!r}".format(
+                type(holder).__name__, name
+            ))
+        observable = prop._get_observable(holder)  # pylint: disable=protected-access
+        observables[id(observable)] = observable
+
+    batches = []  # type: T.List[_Batch]
+    try:
+        for observable in observables.values():
+            batch = observable.batch()
+            batch.__enter__()
+            batches.append(batch)
+        for name, value in fields.items():
+            setattr(holder, name, value)
+    finally:
+        for batch in reversed(batches):
+            batch.__exit__(None, None, None)
@@ -1,4 +1,8 @@
-import socket
+import os, socket, struct, threading, time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+ScanDiff = namedtuple("ScanDiff", "newly_open newly_closed")
 
 class IpRange():
   def __init__(self, start_ip, end_ip):
@@ -7,8 +11,10 @@ class IpRange():
     temp = start
     ip_range = []
 
-    if start[1] > 255 or start[2] > 255 or start[3] > 255 or start[4] > 255 or end[1] > 255 or end[2] > 255 or end[3] > 255 or end[4] > 255 or len(start) != 4 or len(end) != 4:
+    if len(start) != 4 or len(end) != 4 or not all(0 <= n <= 255 for n in start + end):
       raise ValueError("Invalid IP")
+    if start > end:
+      raise ValueError("Invalid IP range")
 
     ip_range.append(start_ip)
     while temp != end:
@@ -21,25 +27,179 @@ class IpRange():
 
     self.ip_range = ip_range
 
+class TokenBucket():
+  """Paces callers to rate acquisitions per second, allowing bursts of up
+  to burst. Callers are served in order and sleep until their token is
+  due, so one bucket can be shared by many threads."""
+
+  def __init__(self, rate, burst=1):
+    if rate <= 0 or burst < 1:
+      raise ValueError("Invalid rate")
+    self.rate = rate
+    self.burst = burst
+    self.tokens = burst
+    self.updated = time.monotonic()
+    self.lock = threading.Lock()
+
+  def acquire(self):
+    with self.lock:
+      now = time.monotonic()
+      self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+      self.updated = now
+      # tokens may go negative, that reserves the next due slot
+      self.tokens -= 1
+      wait = -self.tokens / self.rate
+    if wait > 0:
+      time.sleep(wait)
+
+def ip_to_int(ip):
+  return int.from_bytes(socket.inet_aton(ip), "big")
+
+class HostStateCache():
+  """Last known state of every probed host of one port, stored in a compact
+  binary file: a header followed by one 21 byte record per host holding the
+  address as integer, whether it was open, when it was last probed and when
+  its state last changed.
+
+  Open and unknown hosts are always due for a probe. Closed hosts are
+  skipped for closed_ttl seconds after a probe, hosts closed for longer
+  than dead_after seconds are only probed every dead_ttl seconds."""
+
+  header = struct.Struct("<4sH")
+  record = struct.Struct("<IBdd")
+  magic = b"YHSC"
+
+  def __init__(self, path, port, closed_ttl=0, dead_after=86400, dead_ttl=21600):
+    self.path = os.fspath(path)
+    self.port = port
+    self.closed_ttl = closed_ttl
+    self.dead_after = dead_after
+    self.dead_ttl = dead_ttl
+    self.hosts = {}  # ip as int -> (open, last probe, last change)
+    if os.path.exists(self.path):
+      self.load()
+
+  def load(self):
+    with open(self.path, "rb") as file:
+      data = file.read()
+    if len(data) < self.header.size:
+      raise ValueError("Invalid host state cache")
+    magic, port = self.header.unpack_from(data)
+    if magic != self.magic or port != self.port or (len(data) - self.header.size) % self.record.size:
+      raise ValueError("Invalid host state cache")
+    self.hosts = {
+      ip: (bool(is_open), checked, changed)
+      for ip, is_open, checked, changed in self.record.iter_unpack(data[self.header.size:])
+    }
+
+  def save(self):
+    data = [self.header.pack(self.magic, self.port)]
+    for ip, (is_open, checked, changed) in self.hosts.items():
+      data.append(self.record.pack(ip, is_open, checked, changed))
+    # write a temporary file first, an interrupted save keeps the old cache
+    temp = self.path + ".tmp"
+    with open(temp, "wb") as file:
+      file.write(b"".join(data))
+    os.replace(temp, self.path)
+
+  def state(self, ip):
+    """Returns True/False for hosts last seen open/closed, None if unknown."""
+    host = self.hosts.get(ip)
+    return None if host is None else host[0]
+
+  def due(self, ip, now):
+    host = self.hosts.get(ip)
+    if host is None or host[0]:
+      return True
+    _, checked, changed = host
+    ttl = self.dead_ttl if now - changed >= self.dead_after else self.closed_ttl
+    return now - checked >= ttl
+
+  def update(self, ip, is_open, now):
+    """Stores a probe result and returns the previous state."""
+    host = self.hosts.get(ip)
+    if host is None or host[0] != is_open:
+      self.hosts[ip] = (is_open, now, now)
+      return None if host is None else host[0]
+    self.hosts[ip] = (is_open, now, host[2])
+    return is_open
+
 class IpRangeScanner():
-      def __init__(self, ip_range: IpRange, port: int, result_file):
+      def __init__(self, ip_range: IpRange, port: int, result_file, workers=1, rate=0, burst=1, cache: HostStateCache = None):
+        if cache is not None and int(cache.port) != int(port):
+          raise ValueError("Cache is for another port")
         self.ip_range = ip_range.ip_range
         self.port = port
         self.result_file = result_file
+        self.workers = workers
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.cache = cache
+        self.probes = 0
+        self.elapsed = 0.0
+        self.diff = ScanDiff([], [])
+        self.__lock = threading.Lock()
+
+      @property
+      def achieved_rate(self):
+        """Probes per second of the last scan."""
+        return self.probes / self.elapsed if self.elapsed else 0.0
 
       def scan(self):
-        for ip in self.ip_range:
-          self.__scan(ip)
-      
+        """Probes the range and returns a ScanDiff of the hosts that were
+        newly found open or closed. With a cache, known-open hosts are
+        probed first, hosts that aren't due are skipped and the cache is
+        saved afterwards."""
+
+        self.probes = 0
+        self.diff = ScanDiff([], [])
+        ips = self.ip_range
+        if self.cache is not None:
+          now = time.time()
+          ips = [ip for ip in ips if self.cache.due(ip_to_int(ip), now)]
+          # the sort is stable, so hosts keep their order within a state
+          order = {True: 0, None: 1, False: 2}
+          ips.sort(key=lambda ip: order[self.cache.state(ip_to_int(ip))])
+
+        started = time.monotonic()
+        if self.workers > 1:
+          with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for _ in executor.map(self.__scan, ips):
+              pass
+        else:
+          for ip in ips:
+            self.__scan(ip)
+        self.elapsed = time.monotonic() - started
+
+        if self.cache is not None:
+          self.cache.save()
+        return self.diff
+
       def __scan(self, ip):
+        is_open = self.__probe(ip)
+        with self.__lock:
+          if self.cache is None:
+            previous = None
+          else:
+            previous = self.cache.update(ip_to_int(ip), is_open, time.time())
+          if is_open and previous is not True:
+            self.diff.newly_open.append(ip)
+          elif not is_open and previous is True:
+            self.diff.newly_closed.append(ip)
+
+      def __probe(self, ip):
+        if self.bucket is not None:
+          self.bucket.acquire()
+        with self.__lock:
+          self.probes += 1
         s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         s.settimeout(2)
         try:
           s.connect((ip, int(self.port)))
           s.shutdown(socket.SHUT_RDWR)
-          file = open(self.result_file, "a+")
-          file.write(ip + "\n")
+          with self.__lock, open(self.result_file, "a+") as file:
+            file.write(ip + "\n")
+          return True
         except:
-          pass
+          return False
         finally:
-          s.close()
\ No newline at end of file
+          s.close()
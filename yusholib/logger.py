@@ -1,62 +1,471 @@
 from typing import Literal
-from pystyle import Colors
-import time
+from collections import OrderedDict, deque
+import atexit, json, os, sys, threading, time, weakref
+
+class _Colour:
+  """Class attribute rendered from pystyle's Colors on first access, so
+  pystyle is only imported once something is actually coloured."""
+
+  def __init__(self, render):
+    self.render = render
+
+  def __set_name__(self, owner, name):
+    self.owner = owner
+    self.name = name
+
+  def __get__(self, instance, owner=None):
+    from pystyle import Colors
+    value = self.render(Colors)
+    setattr(self.owner, self.name, value)
+    return value
 
 class Logger:
   
-  w = Colors.white
-  r = Colors.red
-  y = Colors.yellow
-  c = Colors.cyan
-  g = Colors.green
-  re = Colors.reset
-  gr = Colors.gray
+  w = _Colour(lambda c: c.white)
+  r = _Colour(lambda c: c.red)
+  y = _Colour(lambda c: c.yellow)
+  c = _Colour(lambda c: c.cyan)
+  g = _Colour(lambda c: c.green)
+  re = _Colour(lambda c: c.reset)
+  gr = _Colour(lambda c: c.gray)
   
-  separator = f'{re}{w}:: '
+  separator = _Colour(lambda c: f'{Logger.re}{Logger.w}:: ')
   
-  err_prefix = f'{re}{r}ERROR   {separator}'
-  wrn_prefix = f'{re}{y}WARN    {separator}'
-  suc_prefix = f'{re}{g}SUCCESS {separator}'
-  inf_prefix = f'{re}{c}INFO    {separator}'
-  dbg_prefix = f'{re}{w}DEBUG   {separator}'
+  err_prefix = _Colour(lambda c: f'{Logger.re}{Logger.r}ERROR   {Logger.separator}')
+  wrn_prefix = _Colour(lambda c: f'{Logger.re}{Logger.y}WARN    {Logger.separator}')
+  suc_prefix = _Colour(lambda c: f'{Logger.re}{Logger.g}SUCCESS {Logger.separator}')
+  inf_prefix = _Colour(lambda c: f'{Logger.re}{Logger.c}INFO    {Logger.separator}')
+  dbg_prefix = _Colour(lambda c: f'{Logger.re}{Logger.w}DEBUG   {Logger.separator}')
+
+  levels = {'error': 0, 'warn': 1, 'success': 2, 'info': 2, 'debug': 3}
   
-  def __init__(self, level: Literal['error', 'warn', 'info', 'debug'], /, hide_time:bool=False, timestamp_format:str="%m/%d/%YT%H:%M:%S"):
-    if level == 'error':
-        self.level = 0
-    elif level == 'warn':
-        self.level = 1
-    elif level == 'success' or level =='info':
-        self.level = 2
-    elif level == 'debug':
-        self.level = 3
+  def __init__(self, level: Literal['error', 'warn', 'info', 'debug'], /, hide_time:bool=False, timestamp_format:str="%m/%d/%YT%H:%M:%S", sinks=None, rate_limiter=None, rate_key:Literal['template', 'site']='template', collapse_duplicates:bool=False, observable=None):
+    if level not in self.levels:
+      raise ValueError("Invalid level")
+    self.level = self.levels[level]
 
     self.hide_time = hide_time
     self.timestamp_format = timestamp_format
+    self.sinks = [StreamSink()] if sinks is None else list(sinks)
+    self.rate_limiter = rate_limiter
+    self.rate_key = rate_key
+    self.collapse_duplicates = collapse_duplicates
+    self.observable = observable
+    self.__stamp = (None, None, None)
+    self.__last = (None, None, 0)
+    self.__last_lock = threading.Lock()
+    if collapse_duplicates:
+      # held repeats would otherwise be lost when exiting mid-burst
+      _flush_at_exit.add(self)
+
+  def is_enabled(self, level):
+    """Returns whether messages of the given level (a name or a number)
+    would be written. Use it to guard expensive payload builds."""
 
-  def __time(self):
-    _date = time.strftime(self.timestamp_format, time.localtime()) 
+    if level.__class__ is str:
+      level = self.levels[level]
+    return level <= self.level
 
+  def flush(self):
+    self.__flush_repeats()
+    for sink in self.sinks:
+      sink.flush()
+
+  def close(self):
+    self.__flush_repeats()
+    for sink in self.sinks:
+      sink.close()
+    _flush_at_exit.discard(self)
+
+  @staticmethod
+  def __format(message, args, kwargs):
+    """Renders a message only once its level is known to be enabled.
+    A format string is filled with args/kwargs and a plain function or
+    lambda without required parameters is called for its text. Any other
+    object, including classes and bound methods, is logged as is."""
+
+    if args or kwargs:
+      return message.format(*args, **kwargs)
+    if message.__class__ is _Function and _takes_no_args(message):
+      return message()
+    return message
+
+  def __time(self, created):
     if self.hide_time:
-      return ""
+      return None
+
+    # strftime has no unit finer than a second, so the rendered date is
+    # reused until the second (or the format) changes.
+    now = int(created)
+    second, fmt, date = self.__stamp
+    if second != now or fmt is not self.timestamp_format:
+      fmt = self.timestamp_format
+      date = time.strftime(fmt, time.localtime(now))
+      self.__stamp = (now, fmt, date)
+    return date
+
+  def __log(self, level, message, args, kwargs):
+    created = time.time()
+
+    template = message
+    if self.observable is not None:
+      message = self.__publish(level, message, args, kwargs, created)
+
+    if self.rate_limiter is not None:
+      if self.rate_key == 'site':
+        frame = sys._getframe(2)
+        key = (frame.f_code, frame.f_lineno)
+      elif template.__class__ is str:
+        key = (level, template)
+      else:
+        # callables share a bucket per code object, anything else (e.g.
+        # exception instances, which may be unhashable too) per type
+        key = (level, getattr(template, '__code__', None) or type(template))
+      suppressed = self.rate_limiter.allow(key, created)
+      if suppressed is None:
+        return
     else:
-      return f"{self.gr}[{_date}] "
+      suppressed = 0
+
+    if message is template:
+      message = self.__format(message, args, kwargs)
+    if suppressed:
+      message = f'{message} ({suppressed} similar messages suppressed)'
+
+    if self.collapse_duplicates:
+      with self.__last_lock:
+        last_level, last_message, repeats = self.__last
+        if level == last_level and message == last_message:
+          self.__last = (level, message, repeats + 1)
+          return
+        self.__last = (level, message, 0)
+        # emitted under the lock, so a summary precedes the next message
+        if repeats:
+          self.__emit(last_level, f'last message repeated {repeats} times', created)
+        self.__emit(level, message, created)
+      return
+
+    self.__emit(level, message, created)
+
+  def __publish(self, level, message, args, kwargs, created):
+    """Triggers a LogRecord as 'log.<level>' and 'log' on the observable.
+    Returns the formatted message, or the template untouched when nothing
+    is subscribed."""
+
+    event = _EVENTS[level]
+    specific = self.observable.has_handlers(event)
+    generic = self.observable.has_handlers('log')
+    if not (specific or generic):
+      return message
+
+    record = LogRecord(level, created, self.__format(message, args, kwargs), message, args, kwargs)
+    if specific:
+      self.observable.trigger(event, record)
+    if generic:
+      self.observable.trigger('log', record)
+    return record.message
+
+  def __flush_repeats(self):
+    with self.__last_lock:
+      level, message, repeats = self.__last
+      self.__last = (None, None, 0)
+      if repeats:
+        self.__emit(level, f'last message repeated {repeats} times', time.time())
+
+  def __emit(self, level, message, created):
+    date = self.__time(created)
+    for sink in self.sinks:
+      sink.emit(level, created, date, message)
 
-  def error(self, message):
+  def error(self, message, *args, **kwargs):
     if 0 <= self.level:
-      print(f'{self.__time()}{self.err_prefix}{message}{self.re}')
+      self.__log('error', message, args, kwargs)
 
-  def warn(self, message):
+  def warn(self, message, *args, **kwargs):
     if 1 <= self.level:
-      print(f'{self.__time()}{self.wrn_prefix}{message}{self.re}')
+      self.__log('warn', message, args, kwargs)
 
-  def success(self, message):
+  def success(self, message, *args, **kwargs):
     if 2 <= self.level:
-      print(f'{self.__time()}{self.suc_prefix}{message}{self.re}')
+      self.__log('success', message, args, kwargs)
     
-  def info(self, message):
+  def info(self, message, *args, **kwargs):
     if 2 <= self.level:
-      print(f'{self.__time()}{self.inf_prefix}{message}{self.re}')
+      self.__log('info', message, args, kwargs)
 
-  def debug(self, message):
+  def debug(self, message, *args, **kwargs):
     if 3 <= self.level:
-      print(f'{self.__time()}{self.dbg_prefix}{message}{self.re}')
\ No newline at end of file
+      self.__log('debug', message, args, kwargs)
+
+
+_Function = type(lambda: None)
+
+def _takes_no_args(function):
+  code = function.__code__
+  return (code.co_argcount == len(function.__defaults__ or ())
+          and code.co_kwonlyargcount == len(function.__kwdefaults__ or ()))
+
+
+class LogRecord:
+  """A single Logger call as passed to Observable handlers."""
+
+  __slots__ = ('level', 'created', 'message', 'template', 'args', 'kwargs')
+
+  def __init__(self, level, created, message, template, args, kwargs):
+    self.level = level
+    self.created = created
+    self.message = message
+    self.template = template
+    self.args = args
+    self.kwargs = kwargs
+
+  def __repr__(self):
+    return f'LogRecord({self.level!r}, {self.message!r})'
+
+
+_EVENTS = {level: f'log.{level}' for level in Logger.levels}
+
+
+class RateLimiter:
+  """Token buckets for Logger rate limiting. Every key may log burst
+  messages at once and rate messages per second after that. Only the
+  max_keys most recently used keys are tracked."""
+
+  def __init__(self, rate, burst=10, max_keys=1024):
+    self.rate = rate
+    self.burst = burst
+    self.max_keys = max_keys
+    self._lock = threading.Lock()
+    self._buckets = OrderedDict()  # key -> [tokens, last update, suppressed]
+
+  def allow(self, key, now):
+    """Returns None if a message for key has to be dropped, otherwise the
+    number of messages dropped for key since it was last allowed."""
+
+    with self._lock:
+      bucket = self._buckets.get(key)
+      if bucket is None:
+        if len(self._buckets) >= self.max_keys:
+          self._buckets.popitem(last=False)
+        self._buckets[key] = [self.burst - 1, now, 0]
+        return 0
+
+      self._buckets.move_to_end(key)
+      tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+      bucket[1] = now
+      if tokens < 1:
+        bucket[0] = tokens
+        bucket[2] += 1
+        return None
+
+      suppressed = bucket[2]
+      bucket[0] = tokens - 1
+      bucket[2] = 0
+      return suppressed
+
+
+# Sinks and loggers flushed when the interpreter exits. Held weakly, so
+# one that is dropped without close() doesn't stay alive until then.
+_flush_at_exit = weakref.WeakSet()
+
+@atexit.register
+def _flush_all():
+  for obj in list(_flush_at_exit):
+    obj.flush()
+
+
+_COLOUR_PREFIXES = {}
+
+_PLAIN_PREFIXES = {
+  'error': 'ERROR   :: ',
+  'warn': 'WARN    :: ',
+  'success': 'SUCCESS :: ',
+  'info': 'INFO    :: ',
+  'debug': 'DEBUG   :: ',
+}
+
+
+class Sink:
+  """Base class for Logger outputs. Level prefixes are picked once per
+  sink, so sinks without colour never format escape sequences."""
+
+  colour = False
+
+  def __init__(self, colour=None):
+    if colour is not None:
+      self.colour = colour
+    if self.colour:
+      if not _COLOUR_PREFIXES:
+        _COLOUR_PREFIXES.update({
+          'error': Logger.err_prefix,
+          'warn': Logger.wrn_prefix,
+          'success': Logger.suc_prefix,
+          'info': Logger.inf_prefix,
+          'debug': Logger.dbg_prefix,
+        })
+      self.prefixes = _COLOUR_PREFIXES
+      self.stamp_prefix = f'{Logger.gr}['
+      self.suffix = Logger.re
+    else:
+      self.prefixes = _PLAIN_PREFIXES
+      self.stamp_prefix = '['
+      self.suffix = ''
+
+  def render(self, level, date, message):
+    if date is None:
+      return f'{self.prefixes[level]}{message}{self.suffix}'
+    return f'{self.stamp_prefix}{date}] {self.prefixes[level]}{message}{self.suffix}'
+
+  def emit(self, level, created, date, message):
+    self.write(self.render(level, date, message))
+
+  def write(self, line):
+    raise NotImplementedError
+
+  def flush(self):
+    pass
+
+  def close(self):
+    self.flush()
+
+
+class StreamSink(Sink):
+  """Prints coloured lines to a stream, sys.stdout by default."""
+
+  colour = True
+
+  def __init__(self, stream=None, colour=None):
+    super().__init__(colour)
+    self.stream = stream
+
+  def write(self, line):
+    print(line, file=self.stream)
+
+  def flush(self):
+    if self.stream is not None:
+      self.stream.flush()
+
+
+class FileSink(Sink):
+  """Appends plain lines to a file. Lines are buffered and written in bulk
+  once buffer_size bytes are pending, on flush() and at exit."""
+
+  def __init__(self, path, colour=None, buffer_size=8192, encoding='utf-8'):
+    super().__init__(colour)
+    self.path = path
+    self.buffer_size = buffer_size
+    self.encoding = encoding
+    self._lock = threading.Lock()
+    self._buffer = []
+    self._buffered = 0
+    self._file = open(path, 'ab')
+    _flush_at_exit.add(self)
+
+  def write(self, line):
+    data = f'{line}\n'.encode(self.encoding)
+    with self._lock:
+      self._buffer.append(data)
+      self._buffered += len(data)
+      if self._buffered >= self.buffer_size:
+        self._write_buffer()
+
+  def _write_buffer(self):
+    if self._buffer:
+      self._file.write(b''.join(self._buffer))
+      self._file.flush()
+      self._buffer.clear()
+      self._buffered = 0
+
+  def flush(self):
+    with self._lock:
+      self._write_buffer()
+
+  def close(self):
+    with self._lock:
+      if self._file.closed:
+        return
+      self._write_buffer()
+      self._file.close()
+    _flush_at_exit.discard(self)
+
+  def __del__(self):
+    if hasattr(self, '_file'):
+      self.close()
+
+
+class RotatingFileSink(FileSink):
+  """A FileSink that rotates to path.1 .. path.<backup_count> once the file
+  would grow past max_bytes, or every interval seconds. Either limit is
+  disabled when set to 0."""
+
+  def __init__(self, path, max_bytes=0, interval=0, backup_count=5, colour=None, buffer_size=8192, encoding='utf-8'):
+    super().__init__(path, colour, buffer_size, encoding)
+    self.max_bytes = max_bytes
+    self.interval = interval
+    self.backup_count = backup_count
+    self._size = self._file.tell()
+    self._rollover_at = time.time() + interval
+
+  def emit(self, level, created, date, message):
+    if self.interval and created >= self._rollover_at:
+      self.rollover()
+      self._rollover_at = created + self.interval
+    super().emit(level, created, date, message)
+
+  def write(self, line):
+    data = f'{line}\n'.encode(self.encoding)
+    with self._lock:
+      pending = self._size + self._buffered
+      if self.max_bytes and pending and pending + len(data) > self.max_bytes:
+        self._rollover()
+      self._buffer.append(data)
+      self._buffered += len(data)
+      if self._buffered >= self.buffer_size:
+        self._write_buffer()
+
+  def _write_buffer(self):
+    self._size += self._buffered
+    super()._write_buffer()
+
+  def rollover(self):
+    with self._lock:
+      self._rollover()
+
+  def _rollover(self):
+    self._write_buffer()
+    self._file.close()
+    if self.backup_count > 0:
+      for i in range(self.backup_count - 1, 0, -1):
+        source = f'{self.path}.{i}'
+        if os.path.exists(source):
+          os.replace(source, f'{self.path}.{i + 1}')
+      os.replace(self.path, f'{self.path}.1')
+      self._file = open(self.path, 'ab')
+    else:
+      self._file = open(self.path, 'wb')
+    self._size = 0
+
+
+class JsonLinesSink(FileSink):
+  """Writes one JSON object per record with time, level and message fields.
+  Never coloured."""
+
+  def __init__(self, path, buffer_size=8192, encoding='utf-8'):
+    super().__init__(path, False, buffer_size, encoding)
+
+  def emit(self, level, created, date, message):
+    self.write(json.dumps({'time': created, 'level': level, 'message': str(message)}, ensure_ascii=False))
+
+
+class MemorySink(Sink):
+  """Keeps the last capacity lines in memory, handy for tests."""
+
+  def __init__(self, capacity=1000, colour=None):
+    super().__init__(colour)
+    self.lines = deque(maxlen=capacity)
+
+  def write(self, line):
+    self.lines.append(line)
+
+  def clear(self):
+    self.lines.clear()